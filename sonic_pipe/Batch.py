@@ -0,0 +1,168 @@
+#!/usr/local/bin/python3
+# -*- coding: utf-8 -*-
+import sys
+import threading
+
+from typing import Any, List, TextIO
+from time import sleep
+
+from pythonosc import (osc_message_builder, dispatcher)
+
+from .DaemonConfig import DaemonConfig
+from .CodeSplitting import split_units, split_blocks, context_setting
+from .Preflight import preflight
+from .Transport import hub
+
+
+class BatchRunner():
+
+    """
+    Non-interactive runner used by the 'sonic-pipe run' command. Files
+    and streams are split into evaluation units that are all sent through
+    the same persistent OSC client. Errors reported by the server are
+    counted so that the caller can exit with a meaningful status:
+
+    - 0: everything was sent and no error came back.
+    - 1: the server reported at least one error or syntax error, or a
+      unit was blocked by the preflight checks.
+    - 2: something failed locally (unreadable file, etc).
+    - 3: code was sent but server errors couldn't be listened to (the
+      port is usually held by the Sonic Pi GUI). Use listen=False to
+      send without checking for errors.
+
+    The runner doesn't touch the REPL, the greeter or the help system.
+    """
+
+    def __init__(self, values: DaemonConfig,
+                 address: str = '127.0.0.1',
+                 listen: bool = True,
+                 preflight_mode: str = "warn"):
+
+        self._values = values
+        self._address = address
+        self._preflight_mode = preflight_mode
+        self._client = hub.acquire_client(
+                address, int(self._values.gui_send_to_server))
+        self._lock = threading.Lock()
+        self._sent, self._errors, self._failures = 0, 0, 0
+        self._dispatcher = None
+        self._listen_failed = False
+
+        if listen:
+            try:
+                self.setup_error_server()
+            except OSError as e:
+                print(f"Can't listen to server errors: {e}", file=sys.stderr)
+                self._listen_failed = True
+
+    def setup_error_server(self) -> None:
+
+        """
+        Listen to the GUI port to catch /error and /syntax_error replies.
+        Regular logs are ignored: nothing is printed unless it went wrong.
+        """
+
+        osc_dispatcher = dispatcher.Dispatcher()
+        osc_dispatcher.map("/error", self.error_dispatcher)
+        osc_dispatcher.map("/syntax_error", self.error_dispatcher)
+        hub.acquire_receiver(
+                int(self._values.gui_listen_to_server), osc_dispatcher)
+        self._dispatcher = osc_dispatcher
+
+    def error_dispatcher(self, address: str, *osc_arguments: List[Any]) -> None:
+
+        """
+        Count and report errors. The first argument is the job id.
+        """
+
+        with self._lock:
+            self._errors += 1
+        print(f"{address}: " + " ".join(
+            map(lambda x: str(x), osc_arguments[1:])), file=sys.stderr)
+
+    def send(self, code: str) -> None:
+
+        """
+        Send a single evaluation unit to the server.
+        """
+
+        if not any(c.isalpha() for c in code):
+            return
+        if self._preflight_mode != "off":
+            issues = preflight(code)
+            for issue in issues:
+                print(issue, file=sys.stderr)
+            if issues and self._preflight_mode == "block":
+                with self._lock:
+                    self._errors += 1
+                return
+        message = osc_message_builder.OscMessageBuilder("/run-code")
+        message.add_arg(self._values.token)
+        message.add_arg(code)
+        self._client.send(message.build())
+        self._sent += 1
+
+    def run_stream(self, stream: TextIO, whole: bool = False) -> None:
+
+        """
+        Send the content of a stream, unit by unit as they are read. With
+        whole=True, the stream is read to the end and sent as one unit.
+
+        Top-level settings (use_bpm...) met along the way are sent again in
+        front of every following unit, so that 'use_bpm 120' followed by a
+        blank line still applies to the live_loops sent after it.
+        """
+
+        if whole:
+            self.send(stream.read())
+            return
+
+        context = {}
+        for unit in split_units(stream):
+            prefix = "\n".join(context.values())
+            blocks = split_blocks(unit)
+            settings = [(context_setting(b), b) for b in blocks]
+            for name, block in settings:
+                if name is not None:
+                    context[name] = block
+            if all(name is not None for name, _ in settings):
+                # Only settings: nothing to play on their own
+                continue
+            self.send(prefix + "\n" + unit if prefix else unit)
+
+    def run_file(self, path: str) -> None:
+
+        """
+        Send a file as a single evaluation unit, like a Sonic Pi buffer.
+        """
+
+        try:
+            with open(path, "r") as f:
+                self.send(f.read())
+        except OSError as e:
+            print(f"Can't read {path}: {e}", file=sys.stderr)
+            self._failures += 1
+
+    def finish(self, wait: float = 1.0) -> int:
+
+        """
+        Wait for late error replies, release the sockets and return the
+        exit status.
+        """
+
+        if self._dispatcher is not None:
+            if self._sent:
+                sleep(wait)
+            hub.release_receiver(
+                    int(self._values.gui_listen_to_server), self._dispatcher)
+            self._dispatcher = None
+        if self._client is not None:
+            hub.release_client(
+                    self._address, int(self._values.gui_send_to_server))
+            self._client = None
+
+        if self._failures:
+            return 2
+        if self._errors:
+            return 1
+        return 3 if self._listen_failed else 0
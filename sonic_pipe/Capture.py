@@ -0,0 +1,277 @@
+#!/usr/local/bin/python3
+# -*- coding: utf-8 -*-
+import os
+import glob
+import gzip
+import shutil
+import struct
+import threading
+
+from dataclasses import dataclass
+from queue import SimpleQueue
+from time import monotonic_ns
+from typing import Any, Dict, Iterator, List, Tuple
+
+# Messages recorded when a capture is attached to the log server
+CAPTURED_ADDRESSES = ["/log/*", "/error", "/syntax_error", "/incoming/osc"]
+
+_MAGIC = b"SPCAP\x00\x01\x00"
+_ADDRESS, _MESSAGE = (0, 1)
+_ADDRESS_HEADER = struct.Struct("<BHH")   # kind, address id, length
+_MESSAGE_HEADER = struct.Struct("<BqHH")  # kind, timestamp, address id, argc
+_LENGTH = struct.Struct("<I")
+_INT = struct.Struct("<q")
+_FLOAT = struct.Struct("<d")
+
+
+@dataclass
+class CaptureRecord:
+
+    """
+    A single message read back from a capture file. The timestamp comes
+    from time.monotonic_ns() and is only meaningful within a session.
+    """
+
+    timestamp: int
+    address: str
+    args: Tuple[Any, ...]
+
+
+def _rotated_files(path: str) -> List[Tuple[int, str]]:
+
+    """
+    Rotated files of a capture (path.1.gz, path.2.gz...) sorted by index.
+    """
+
+    rotated = []
+    for candidate in glob.glob(glob.escape(path) + ".*"):
+        suffix = candidate[len(path) + 1:].replace(".gz", "")
+        if suffix.isdigit():
+            rotated.append((int(suffix), candidate))
+    return sorted(rotated)
+
+
+def _encode_args(args: Tuple[Any, ...]) -> bytes:
+    chunks = []
+    for arg in args:
+        if arg is None:
+            chunks.append(b"N")
+        elif isinstance(arg, bool):
+            chunks.append(b"T" if arg else b"F")
+        elif isinstance(arg, int):
+            chunks.append(b"i" + _INT.pack(arg))
+        elif isinstance(arg, float):
+            chunks.append(b"f" + _FLOAT.pack(arg))
+        elif isinstance(arg, (bytes, bytearray)):
+            chunks.append(b"b" + _LENGTH.pack(len(arg)) + bytes(arg))
+        else:
+            data = str(arg).encode("utf-8")
+            chunks.append(b"s" + _LENGTH.pack(len(data)) + data)
+    return b"".join(chunks)
+
+
+class CaptureWriter():
+
+    """
+    Append-only recorder for server traffic. The record method only puts
+    the message on a queue: encoding and writing happen in a background
+    thread, so that recording costs almost nothing to the log server.
+
+    Records hold a monotonic timestamp, an address id and the arguments.
+    Addresses are interned: the first time an address is seen, a small
+    definition record maps it to an id used by the following records.
+
+    When the file grows past max_bytes, it is renamed to path.N, then
+    compressed to path.N.gz and a new file is started. Each file holds
+    its own address definitions and can be read on its own.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 16 * 1024 * 1024,
+                 compress: bool = True):
+        self._path = path
+        self._max_bytes, self._compress = (max_bytes, compress)
+        self._queue = SimpleQueue()
+        self._index = self._next_index()
+        self._open()
+        self._thread = threading.Thread(target=self._writer)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _next_index(self) -> int:
+        rotated = _rotated_files(self._path)
+        return rotated[-1][0] + 1 if rotated else 1
+
+    def _open(self) -> None:
+        # Appending to an existing file starts a new session: the magic
+        # bytes tell the reader to forget previous address definitions.
+        self._file = open(self._path, "ab")
+        self._file.write(_MAGIC)
+        self._size = self._file.tell()
+        self._addresses: Dict[str, int] = {}
+
+    def record(self, address: str, *osc_arguments: List[Any]) -> None:
+
+        """
+        Dispatcher compatible handler: queue a message for writing.
+        """
+
+        self._queue.put((monotonic_ns(), address, osc_arguments))
+
+    def map(self, osc_dispatcher) -> None:
+
+        """
+        Record every log, error and cue message received by a dispatcher.
+        """
+
+        for address in CAPTURED_ADDRESSES:
+            osc_dispatcher.map(address, self.record)
+
+    def _encode(self, timestamp: int, address: str,
+                args: Tuple[Any, ...]) -> bytes:
+        chunks = []
+        address_id = self._addresses.get(address)
+        if address_id is None:
+            address_id = self._addresses[address] = len(self._addresses)
+            data = address.encode("utf-8")
+            chunks.append(_ADDRESS_HEADER.pack(_ADDRESS, address_id, len(data)))
+            chunks.append(data)
+        chunks.append(_MESSAGE_HEADER.pack(
+            _MESSAGE, timestamp, address_id, len(args)))
+        chunks.append(_encode_args(args))
+        return b"".join(chunks)
+
+    def _rotate(self) -> None:
+        self._file.close()
+        rotated = f"{self._path}.{self._index}"
+        self._index += 1
+        os.replace(self._path, rotated)
+        if self._compress:
+            with open(rotated, "rb") as src, gzip.open(rotated + ".gz", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(rotated)
+        self._open()
+
+    def _writer(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            data = self._encode(*item)
+            self._file.write(data)
+            self._size += len(data)
+            if self._size >= self._max_bytes:
+                self._rotate()
+            elif self._queue.empty():
+                self._file.flush()
+        self._file.close()
+
+    def close(self) -> None:
+
+        """
+        Write everything still queued and close the file.
+        """
+
+        self._queue.put(None)
+        self._thread.join()
+
+
+def _read_bytes(data: bytes, offset: int, length: int) -> bytes:
+
+    """
+    Slice that raises struct.error, like unpack_from, when the data ends
+    before the requested length.
+    """
+
+    if offset + length > len(data):
+        raise struct.error("unexpected end of data")
+    return data[offset:offset + length]
+
+
+def read_capture(path: str) -> Iterator[CaptureRecord]:
+
+    """
+    Read back every record of a capture file, compressed or not. The
+    whole file is loaded at once and decoded from memory.
+
+    Reading stops cleanly on a truncated trailing record (the process was
+    killed while writing). Raise a ValueError if the file is corrupted.
+    """
+
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as f:
+        data = f.read()
+
+    constants = {b"N": None, b"T": True, b"F": False}
+    addresses: Dict[int, str] = {}
+    offset = 0
+    while offset < len(data):
+        start = offset
+        if data.startswith(_MAGIC, offset):
+            # Start of file, or a session appended to an existing file
+            addresses.clear()
+            offset += len(_MAGIC)
+            continue
+        if _MAGIC.startswith(data[offset:]):
+            # Killed while writing the magic bytes of a new session
+            return
+        try:
+            kind = data[offset]
+            if kind == _ADDRESS:
+                _, address_id, length = _ADDRESS_HEADER.unpack_from(data, offset)
+                offset += _ADDRESS_HEADER.size
+                raw = _read_bytes(data, offset, length)
+                addresses[address_id] = raw.decode("utf-8")
+                offset += length
+                continue
+            if kind != _MESSAGE:
+                raise ValueError(
+                    f"{path}: unknown record kind {kind} at offset {start}")
+
+            _, timestamp, address_id, argc = _MESSAGE_HEADER.unpack_from(data, offset)
+            offset += _MESSAGE_HEADER.size
+            args = []
+            for _ in range(argc):
+                tag = _read_bytes(data, offset, 1)
+                offset += 1
+                if tag == b"i":
+                    args.append(_INT.unpack_from(data, offset)[0])
+                    offset += _INT.size
+                elif tag == b"f":
+                    args.append(_FLOAT.unpack_from(data, offset)[0])
+                    offset += _FLOAT.size
+                elif tag in (b"s", b"b"):
+                    (length,) = _LENGTH.unpack_from(data, offset)
+                    offset += _LENGTH.size
+                    raw = _read_bytes(data, offset, length)
+                    args.append(raw.decode("utf-8") if tag == b"s" else raw)
+                    offset += length
+                elif tag in constants:
+                    args.append(constants[tag])
+                else:
+                    raise ValueError(
+                        f"{path}: unknown argument tag {tag!r} at offset "
+                        f"{offset - 1} (record at offset {start})")
+        except struct.error:
+            # Truncated trailing record
+            return
+        if address_id not in addresses:
+            raise ValueError(
+                f"{path}: unknown address id {address_id} at offset {start}")
+        yield CaptureRecord(timestamp, addresses[address_id], tuple(args))
+
+
+def load_capture(path: str) -> List[CaptureRecord]:
+
+    """
+    Load a capture along with its rotated files (path.1.gz, path.2.gz...)
+    in chronological order.
+    """
+
+    paths = [p for _, p in _rotated_files(path)]
+    if os.path.exists(path):
+        paths.append(path)
+
+    records = []
+    for p in paths:
+        records.extend(read_capture(p))
+    return records
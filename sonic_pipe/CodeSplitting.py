@@ -0,0 +1,276 @@
+#!/usr/local/bin/python3
+# -*- coding: utf-8 -*-
+import re
+from typing import Iterable, Iterator, List, Tuple
+
+# Keywords always closed by a matching 'end'
+_OPENERS = {"do", "def", "class", "module", "begin", "case"}
+# Keywords closed by 'end' only when they start a statement (not modifiers)
+_CONDITIONALS = {"if", "unless", "while", "until", "for"}
+# Loops accepting an optional 'do' that doesn't open another block
+_LOOPS = {"while", "until", "for"}
+# Keywords after which a new statement can start
+# ('return' is not one of them: 'return if x' is a modifier)
+_STATEMENT_KEYWORDS = {"do", "then", "else", "elsif", "begin", "and",
+                       "or", "not", "when", "ensure", "rescue"}
+_BRACKETS = {")": "(", "]": "[", "}": "{"}
+_CLOSERS = {"(": ")", "[": "]", "{": "}"}
+_WORD = re.compile(r"[A-Za-z_][A-Za-z0-9_]*[?!]?")
+# Top-level settings (use_bpm, use_synth...) only apply to the job running them
+_CONTEXT = re.compile(r"(use_[a-z_]+)\b")
+# Anything making a setting more than a single statement ('use_bpm 60 if x')
+_NOT_A_SETTING = _OPENERS | _CONDITIONALS | {
+    "end", "then", "rescue", "and", "or", "not"}
+_STRING = re.compile(r""""(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'""")
+_SYMBOL = re.compile(r"(?<![:\w]):[A-Za-z_][A-Za-z0-9_]*[?!]?")
+
+
+class RubyScanner():
+
+    """
+    Minimal incremental scanner for Sonic Pi (Ruby) code. Lines are fed
+    one by one and the scanner keeps track of the blocks currently open
+    (do/end, def/end, brackets...) and of strings spanning several lines.
+    This is not a Ruby parser: it only knows enough to tell where a block
+    starts and where it stops.
+
+    Unbalanced closers are recorded in `issues` as (line, message) pairs,
+    finish() adds what is still left open at the end of the code.
+    """
+
+    def __init__(self):
+        self.issues: List[Tuple[int, str]] = []
+        self._line = 0
+        self._stack: List[Tuple[str, int]] = []
+        self._quote = None
+        self._quote_line = 0
+        self._interpolation = 0
+        self._in_doc = False
+        self._continued = False
+
+    @property
+    def depth(self) -> int:
+        return len(self._stack)
+
+    @property
+    def in_string(self) -> bool:
+        return self._quote is not None or self._in_doc
+
+    def at_top_level(self) -> bool:
+        return not self._stack and not self.in_string and not self._continued
+
+    def feed(self, line: str) -> None:
+
+        """
+        Scan a single line (without its trailing newline).
+        """
+
+        self._line += 1
+        if self._in_doc:
+            if line.startswith("=end"):
+                self._in_doc = False
+            return
+        if line.startswith("=begin"):
+            self._in_doc = True
+            return
+
+        if self._quote is None and (
+                not line.strip() or line.lstrip().startswith("#")):
+            return
+
+        i, n = 0, len(line)
+        statement_start, loop_do, last = True, False, ""
+        while i < n:
+            c = line[i]
+
+            if self._quote is not None:
+                if c == "\\":
+                    i += 2
+                    continue
+                if self._quote == '"' and line.startswith("#{", i):
+                    self._interpolation += 1
+                    i += 2
+                    continue
+                if self._interpolation and c == "}":
+                    self._interpolation -= 1
+                elif not self._interpolation and c == self._quote:
+                    self._quote, last = None, c
+                i += 1
+                continue
+
+            if c == "#":
+                break
+            if c in "\"'":
+                self._quote, self._quote_line = (c, self._line)
+                statement_start = False
+                i += 1
+                continue
+            if c.isspace():
+                i += 1
+                continue
+            last = c
+            if c in "([{":
+                self._stack.append((c, self._line))
+                statement_start = True
+                i += 1
+                continue
+            if c in ")]}":
+                self._close(_BRACKETS[c], c)
+                statement_start = False
+                i += 1
+                continue
+            if c == ":" and i + 1 < n and (
+                    line[i + 1] == ":" or _WORD.match(line, i + 1)):
+                # Symbol (:do, :end) or scope operator: skip the name
+                m = _WORD.match(line, i + 1 if line[i + 1] != ":" else i + 2)
+                i = m.end() if m else i + 2
+                statement_start = False
+                continue
+
+            m = _WORD.match(line, i)
+            if m is None:
+                statement_start = c in "=,|&;!"
+                if c == ";":
+                    loop_do = False
+                i += 1
+                continue
+
+            word, end = m.group(), m.end()
+            method_call = i > 0 and line[i - 1] == "."
+            label = (end < n and line[end] == ":"
+                     and line[end + 1:end + 2] != ":")
+            if method_call or label:
+                pass
+            elif word == "end":
+                self._close(None, word)
+            elif word == "do":
+                if loop_do:
+                    loop_do = False
+                else:
+                    self._stack.append((word, self._line))
+            elif word in _OPENERS:
+                self._stack.append((word, self._line))
+            elif word in _CONDITIONALS and statement_start:
+                self._stack.append((word, self._line))
+                loop_do = word in _LOOPS
+            statement_start = word in _STATEMENT_KEYWORDS or (
+                word in _CONDITIONALS)
+            i = end
+
+        # Trailing comma, operator or backslash: the statement goes on
+        self._continued = self._quote is None and last in ",\\+-*/|&=<>"
+
+    def _close(self, opener: str, closer: str) -> None:
+
+        """
+        Pop the innermost block. Brackets close brackets, 'end' closes
+        keywords (opener=None): anything else is reported as an issue.
+        """
+
+        if not self._stack:
+            self.issues.append((self._line, f"unexpected '{closer}'"))
+            return
+        top, line = self._stack[-1]
+        is_bracket = top in _CLOSERS
+        if (opener is None and not is_bracket) or top == opener:
+            self._stack.pop()
+        elif opener is None:
+            self.issues.append(
+                (self._line, f"'end' found before closing '{top}' of line {line}"))
+        else:
+            self.issues.append(
+                (self._line, f"unexpected '{closer}', '{top}' of line {line} is still open"))
+
+    def finish(self) -> List[Tuple[int, str]]:
+
+        """
+        Report blocks and strings left open at the end of the code.
+        Return every issue found.
+        """
+
+        if self._quote is not None:
+            self.issues.append((self._quote_line, "unterminated string"))
+        elif self._in_doc:
+            self.issues.append((self._line, "missing '=end'"))
+        for opener, line in reversed(self._stack):
+            closer = _CLOSERS.get(opener, "end")
+            self.issues.append((line, f"'{opener}' is never closed by '{closer}'"))
+        return self.issues
+
+
+def split_units(lines: Iterable[str]) -> Iterator[str]:
+
+    """
+    Split a stream of lines into evaluation units. A unit ends on a blank
+    line found at top level, so that blank lines inside a live_loop or a
+    define don't cut the block in half. Units are yielded as soon as they
+    are complete, making it suitable for streams of unknown length.
+    """
+
+    scanner = RubyScanner()
+    unit: List[str] = []
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if not line.strip() and scanner.at_top_level():
+            if unit:
+                yield "\n".join(unit)
+                unit = []
+            continue
+        unit.append(line)
+        scanner.feed(line)
+    if unit:
+        yield "\n".join(unit)
+
+
+def context_setting(block: str) -> str:
+
+    """
+    Name of the setting if the block is a top-level setting such as
+    'use_bpm 120', None otherwise. Settings must be sent along with every
+    other unit, each evaluation being a new job with default settings.
+
+    Only a single use_* statement is a setting: 'use_bpm 120; play 60' or
+    'use_bpm 60 if x' are ordinary code, sent once.
+    """
+
+    match = _CONTEXT.match(block)
+    if match is None:
+        return None
+    rest = _STRING.sub('""', block[match.end():])
+    rest = "\n".join(line.split("#", 1)[0] for line in rest.splitlines())
+    rest = _SYMBOL.sub("", rest)
+    if ";" in rest:
+        return None
+    for word in _WORD.finditer(rest):
+        start, end = word.span()
+        method_call = start > 0 and rest[start - 1] == "."
+        label = rest[end:end + 1] == ":"
+        if word.group() in _NOT_A_SETTING and not (method_call or label):
+            return None
+    return match.group(1)
+
+
+def split_blocks(text: str) -> List[str]:
+
+    """
+    Split a buffer into its top-level statements: every live_loop, define,
+    with_fx... block is returned as a whole, along with every single-line
+    statement found between blocks. Blank lines and comments outside of
+    blocks are dropped.
+    """
+
+    scanner = RubyScanner()
+    blocks: List[str] = []
+    block: List[str] = []
+    for line in text.splitlines():
+        if not block and scanner.at_top_level() and (
+                not line.strip() or line.lstrip().startswith("#")):
+            continue
+        block.append(line)
+        scanner.feed(line)
+        if scanner.at_top_level():
+            blocks.append("\n".join(block))
+            block = []
+    if block:
+        blocks.append("\n".join(block))
+    return blocks
@@ -5,13 +5,15 @@ from os import listdir
 from os.path import isfile, join
 from queue import Queue
 from time import strftime
-from typing import List
+from typing import List, Tuple
 
 from pythonosc import osc_message_builder
 from rich.console import Console
 from rich.markdown import Markdown
 
 from .History import HistoryItem
+from .Preflight import PreflightIssue, preflight
+from .Utilities import color
 
 
 class CommandParser():
@@ -23,7 +25,8 @@ class CommandParser():
     def __init__(self, logs: Queue,
                  history: List[HistoryItem],
                  use_daemon: bool, token: int,
-                 client_pipe, daemon):
+                 client_pipe, daemon,
+                 preflight_mode: str = "warn"):
 
         self._quit_commands = {
             "exit": self._end_script}
@@ -45,6 +48,7 @@ class CommandParser():
         self._client_pipe = client_pipe
         self._use_daemon, self._daemon = (use_daemon, daemon)
         self._token = token
+        self._preflight_mode = preflight_mode
         self._cheat_path, self._user_cheat_path = (
                 os.path.dirname(__file__) + "/cheatsheets/",
                 self._home_dir + "/.sonic-pi/sonic-pipe-help/")
@@ -61,12 +65,12 @@ class CommandParser():
             list.append(list(commands.keys()))
         return list
 
-    def parse(self, text_to_parse: str) -> None:
+    def parse(self, text_to_parse: str) -> Tuple[PreflightIssue, ...]:
 
         """
         Main function to parse strings received from the user. Valid methods are stored
         in dictionnaries. Every command can trigger the appropriate response method by
-        matching a key.
+        matching a key. Return the preflight issues found in code sent to Sonic Pi.
         """
         text = text_to_parse.lower()
 
@@ -88,7 +92,8 @@ class CommandParser():
         elif text in self._history_commands:
             self._history_commands[text]()
         else:
-            self._forward_to_sonic_pi(text_to_parse=text_to_parse)
+            return self._forward_to_sonic_pi(text_to_parse=text_to_parse)
+        return ()
 
     def _print_user_requested_help_file(self, file_to_open: str) -> None:
         """
@@ -106,12 +111,20 @@ class CommandParser():
         except Exception:
             pass
 
-    def _forward_to_sonic_pi(self, text_to_parse) -> None:
+    def _forward_to_sonic_pi(self, text_to_parse) -> Tuple[PreflightIssue, ...]:
+        issues = ()
+        if self._preflight_mode != "off":
+            issues = preflight(text_to_parse)
+            for issue in issues:
+                self._logs.put_nowait(color.RED + str(issue) + color.END)
+            if issues and self._preflight_mode == "block":
+                return issues
         message = osc_message_builder.OscMessageBuilder("/run-code")
         message.add_arg(self._token)
         message.add_arg(text_to_parse)
         if any(c.isalpha() for c in text_to_parse):
             self._client_pipe.send(message.build())
+        return issues
 
     def _print_history(self) -> None:
 
@@ -2,6 +2,38 @@
 # -*- coding: utf-8 -*-
 from dataclasses import dataclass
 
+
+def parse_port_line(portline: str) -> dict:
+
+    """
+    Grab the Ports line found in spider.log and interpret data.
+    """
+
+    values = {}
+
+    def pairwise(iterable):
+        """ Iterate pairwise on iterator """
+        a = iter(iterable)
+        return zip(a, a)
+
+    # list of string replacements to perform
+    to_replace = [
+        "Ports: {", "", "}",
+        "", "\n", "", ":", " ",
+        ",", " ", "=>", " "]
+
+    for token, replacer in pairwise(to_replace):
+        portline = portline.replace(token, replacer)
+    portline = portline.split(" ")
+    portline = [x for x in filter(
+            lambda x: x != "",
+            portline)]
+    for field, value in pairwise(portline):
+        values[field] = int(value)
+
+    return values
+
+
 @dataclass
 class DaemonConfig:
 
@@ -17,3 +49,35 @@ class DaemonConfig:
     tau_api: int
     tau_phx: int
     token: int
+
+    @classmethod
+    def from_spider_log(cls, path: str) -> "DaemonConfig":
+
+        """
+        Read the spider.log file of a running Sonic Pi instance to gather
+        necessary ports and token. Raise FileNotFoundError if the file is
+        missing and ValueError if it doesn't contain the required lines.
+        """
+
+        port_line = None
+        token_line = None
+        with open(path, "r") as f:
+            for i in f.readlines():
+                if i.startswith("Ports:"):
+                    port_line = i
+                if i.startswith("Token: "):
+                    token_line = i
+
+        if port_line is None or token_line is None:
+            raise ValueError(f"No ports or token found in {path}")
+
+        values = parse_port_line(port_line)
+        return cls(
+            daemon_keep_alive=values['server_port'],
+            gui_listen_to_server=values['gui_port'],
+            gui_send_to_server=values['scsynth_port'],
+            scsynth=values['scsynth_send_port'],
+            osc_cues=values['osc_cues_port'],
+            tau_api=values['tau_port'],
+            tau_phx=values['listen_to_tau_port'],
+            token=abs(int(token_line.replace("Token: ", ""))))
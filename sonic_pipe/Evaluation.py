@@ -0,0 +1,282 @@
+#!/usr/local/bin/python3
+# -*- coding: utf-8 -*-
+import heapq
+import itertools
+import threading
+
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass
+from time import monotonic
+from typing import Any, Dict, List, Tuple
+
+from pythonosc import osc_message_builder
+
+REGISTER_ADDRESS = "/sonic_pipe/job"
+ACK_ADDRESS = "/sonic_pipe/ack"
+
+# Process-wide: late acks can't be mistaken for another evaluator's ones
+_sequence = itertools.count(1)
+
+# Errors from unknown jobs kept around in case their registration is late
+MAX_ORPHANS = 256
+
+
+@dataclass
+class EvaluationResult:
+
+    """
+    Outcome of a piece of code sent through Evaluator.evaluate. The status
+    is one of "ok", "error", "syntax_error", "timeout" or "closed". Line and
+    message are filled with what the server reported when something went
+    wrong.
+    """
+
+    status: str
+    seq: int
+    job_id: int = None
+    line: int = None
+    message: str = ''
+
+    @property
+    def ok(self) -> bool:
+        return self.status == "ok"
+
+
+@dataclass
+class _Pending:
+    future: Future
+    lines: List[str]
+    line_offset: int = 0
+    job_id: int = None
+
+
+class Evaluator():
+
+    """
+    Send code to the server and return futures resolved with the outcome
+    of each evaluation. Sonic Pi doesn't reply to /run-code, so the code
+    is instrumented with two OSC messages sent back by the job itself:
+
+    - a registration, joined to the first line with ';' so that line
+      numbers are left untouched, carrying a sequence number and the job
+      id assigned by the server.
+    - an acknowledgement, on a last line, sent once the code ran to the
+      end.
+
+    Runtime errors are matched to evaluations by job id only: errors from
+    other jobs (the GUI, pipe(), a live_loop failing later on) are left
+    alone. A syntax error prevents the registration from running, so it
+    is matched by comparing the faulty line reported by the server with
+    the code of evaluations that haven't registered yet.
+
+    The messages are received on the port used to listen to the server
+    logs: the handlers must be mapped on the log server dispatcher (see
+    Evaluator.map).
+    """
+
+    def __init__(self, client, token: int, ack_port: int,
+                 ack_host: str = '127.0.0.1'):
+        self._client = client
+        self._token = token
+        self._ack_host, self._ack_port = (ack_host, ack_port)
+        self._pending: Dict[int, _Pending] = OrderedDict()
+        self._jobs: Dict[int, int] = {}
+        self._orphans = OrderedDict()
+        self._deadlines = []
+        self._condition = threading.Condition()
+        self._reaper_thread = None
+        self._closed = False
+
+    def map(self, osc_dispatcher) -> None:
+
+        """
+        Register the registration, ack and error handlers on a pythonosc
+        dispatcher.
+        """
+
+        osc_dispatcher.map(REGISTER_ADDRESS, self.register_dispatcher)
+        osc_dispatcher.map(ACK_ADDRESS, self.ack_dispatcher)
+        osc_dispatcher.map("/error", self.error_dispatcher)
+        osc_dispatcher.map("/syntax_error", self.error_dispatcher)
+
+    def evaluate(self, code: str, timeout: float = 5.0) -> Future:
+
+        """
+        Send code to the server. The returned future is resolved with an
+        EvaluationResult: success, error or timeout. It never raises.
+        """
+
+        future = Future()
+        seq = next(_sequence)
+        code, line_offset = self._instrument(code, seq)
+        with self._condition:
+            if self._closed:
+                future.set_result(EvaluationResult(status="closed", seq=seq))
+                return future
+            self._pending[seq] = _Pending(
+                future, code.split("\n"), line_offset)
+            heapq.heappush(self._deadlines, (monotonic() + timeout, seq))
+            self._condition.notify()
+            if self._reaper_thread is None:
+                self._reaper_thread = threading.Thread(target=self._reaper)
+                self._reaper_thread.daemon = True
+                self._reaper_thread.start()
+
+        message = osc_message_builder.OscMessageBuilder("/run-code")
+        message.add_arg(self._token)
+        message.add_arg(code)
+        self._client.send(message.build())
+        return future
+
+    def _osc_send(self, address: str, *args: str) -> str:
+        return (f'osc_send "{self._ack_host}", {self._ack_port}, '
+                f'"{address}", ' + ", ".join(args))
+
+    def _instrument(self, code: str, seq: int) -> Tuple[str, int]:
+
+        """
+        Add the registration and acknowledgement to the code. Return the
+        code along with the number of lines added before the user code:
+        0, unless the code starts with a =begin comment which can't share
+        its line with anything else.
+        """
+
+        job_id = "(__system_thread_locals.get(:sonic_pi_spider_job_id) rescue -1)"
+        register = self._osc_send(REGISTER_ADDRESS, str(seq), job_id)
+        ack = self._osc_send(ACK_ADDRESS, str(seq))
+        if code.startswith("=begin"):
+            return (register + "\n" + code + "\n" + ack, 1)
+        return (register + "; " + code + "\n" + ack, 0)
+
+    def _resolve(self, seq: int, result: EvaluationResult) -> None:
+
+        """
+        Resolve a pending future. Must be called with the lock held.
+        """
+
+        pending = self._pending.pop(seq, None)
+        if pending is None:
+            return
+        self._jobs.pop(pending.job_id, None)
+        if not pending.future.done():
+            pending.future.set_result(result)
+
+    def _error_result(self, seq: int, address: str,
+                      osc_arguments: Tuple[Any, ...]) -> EvaluationResult:
+        line = osc_arguments[3] if len(osc_arguments) > 3 else None
+        if isinstance(line, int):
+            line -= self._pending[seq].line_offset
+        else:
+            line = None
+        return EvaluationResult(
+            status=address.lstrip("/"), seq=seq, job_id=osc_arguments[0],
+            line=line,
+            message=str(osc_arguments[1]) if len(osc_arguments) > 1 else '')
+
+    def register_dispatcher(self, address: str, *osc_arguments: List[Any]) -> None:
+
+        """
+        Dealing with registrations sent at the start of the evaluated code.
+        """
+
+        seq, job_id = osc_arguments[0], osc_arguments[1]
+        with self._condition:
+            pending = self._pending.get(seq)
+            if pending is None or job_id == -1:
+                return
+            pending.job_id = job_id
+            self._jobs[job_id] = seq
+            orphan = self._orphans.pop(job_id, None)
+            if orphan is not None:
+                self._resolve(seq, self._error_result(seq, *orphan))
+
+    def ack_dispatcher(self, address: str, *osc_arguments: List[Any]) -> None:
+
+        """
+        Dealing with acknowledgements sent by the evaluated code.
+        """
+
+        seq = osc_arguments[0]
+        with self._condition:
+            pending = self._pending.get(seq)
+            if pending is not None:
+                self._resolve(seq, EvaluationResult(
+                    status="ok", seq=seq, job_id=pending.job_id))
+
+    def _match_syntax_error(self, osc_arguments: Tuple[Any, ...]) -> int:
+
+        """
+        Find the unregistered evaluation containing the faulty line
+        reported by the server. Arguments are the job id, a description,
+        the faulty line and its number.
+        """
+
+        if len(osc_arguments) < 4 or not isinstance(osc_arguments[3], int):
+            return None
+        faulty, number = str(osc_arguments[2]).strip(), osc_arguments[3]
+        for seq, pending in self._pending.items():
+            if pending.job_id is None and 0 < number <= len(pending.lines) \
+                    and pending.lines[number - 1].strip() == faulty:
+                return seq
+        return None
+
+    def error_dispatcher(self, address: str, *osc_arguments: List[Any]) -> None:
+
+        """
+        Dealing with /error and /syntax_error messages. Arguments are the
+        job id, a description and, in fourth position, the line number.
+        """
+
+        if not osc_arguments:
+            return
+        job_id = osc_arguments[0]
+        with self._condition:
+            seq = self._jobs.get(job_id)
+            if seq is None and address == "/syntax_error":
+                seq = self._match_syntax_error(osc_arguments)
+            if seq is not None:
+                self._resolve(seq, self._error_result(seq, address, osc_arguments))
+                return
+            # Not ours, or registration not received yet
+            self._orphans[job_id] = (address, osc_arguments)
+            while len(self._orphans) > MAX_ORPHANS:
+                self._orphans.popitem(last=False)
+
+    def close(self) -> None:
+
+        """
+        Resolve every pending evaluation as closed and stop the reaper.
+        """
+
+        with self._condition:
+            self._closed = True
+            for seq in list(self._pending):
+                self._resolve(seq, EvaluationResult(status="closed", seq=seq))
+            self._deadlines.clear()
+            self._orphans.clear()
+            self._condition.notify_all()
+        if self._reaper_thread is not None:
+            self._reaper_thread.join()
+
+    def _reaper(self) -> None:
+
+        """
+        Resolve evaluations that didn't get any reply in time. Sleeps until
+        the closest deadline instead of polling.
+        """
+
+        with self._condition:
+            while not self._closed:
+                while self._deadlines and self._deadlines[0][1] not in self._pending:
+                    heapq.heappop(self._deadlines)
+                if not self._deadlines:
+                    self._condition.wait()
+                    continue
+                deadline, seq = self._deadlines[0]
+                delay = deadline - monotonic()
+                if delay > 0:
+                    self._condition.wait(delay)
+                    continue
+                heapq.heappop(self._deadlines)
+                self._resolve(seq, EvaluationResult(status="timeout", seq=seq))
@@ -0,0 +1,44 @@
+#!/usr/local/bin/python3
+# -*- coding: utf-8 -*-
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Tuple
+
+from .CodeSplitting import RubyScanner
+
+# off: nothing is checked, warn: issues are reported but code is sent
+# anyway, block: code with issues never reaches the server.
+PREFLIGHT_MODES = ("off", "warn", "block")
+
+
+@dataclass(frozen=True)
+class PreflightIssue:
+
+    """
+    Problem found locally in a snippet before sending it.
+    """
+
+    line: int
+    message: str
+
+    def __str__(self) -> str:
+        return f"Preflight: line {self.line}: {self.message}"
+
+
+@lru_cache(maxsize=1024)
+def preflight(code: str) -> Tuple[PreflightIssue, ...]:
+
+    """
+    Check do/end, brackets and strings balance in a snippet. Results are
+    cached on the content of the snippet: sending the same buffer again
+    (a common thing when live coding) costs a dictionary lookup.
+
+    This catches the obvious mistakes only. An empty result doesn't mean
+    the code is valid Ruby: the server has the last word.
+    """
+
+    scanner = RubyScanner()
+    for line in code.splitlines():
+        scanner.feed(line)
+    return tuple(PreflightIssue(line, message)
+                 for line, message in scanner.finish())
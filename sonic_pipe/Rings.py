@@ -0,0 +1,163 @@
+#!/usr/local/bin/python3
+# -*- coding: utf-8 -*-
+import re
+import json
+import array
+import numbers
+
+from typing import Any
+
+# Largest UDP payload on IPv4. Some systems use a lower limit (macOS
+# defaults to 9216 bytes), pass your own limit to check_payload if needed.
+MAX_PAYLOAD = 65507
+
+_SYMBOL = re.compile(r"[A-Za-z_][A-Za-z0-9_]*[?!]?\Z")
+
+
+def _osc_string_size(length: int) -> int:
+    """ Size of an OSC string: null terminated, padded to 4 bytes """
+    return (length // 4 + 1) * 4
+
+
+def _scalar(value: Any) -> Any:
+
+    """
+    Turn NumPy scalars (np.int64, np.float32, np.bool_...) into the
+    matching Python value. Anything else is returned untouched.
+    """
+
+    if value is None or type(value) in (int, float, bool, str):
+        return value
+    if hasattr(value, "dtype") and getattr(value, "ndim", None) == 0:
+        return value.item()
+    if isinstance(value, numbers.Integral):
+        return int(value)
+    if isinstance(value, numbers.Real):
+        return float(value)
+    return value
+
+
+def _as_list(values: Any, precision: int = None) -> list:
+
+    """
+    Turn NumPy arrays, array.array and Python sequences into a list of
+    Python numbers. Rounding is done on the whole array when possible.
+    """
+
+    if hasattr(values, "dtype") and hasattr(values, "tolist"):
+        # NumPy (or compatible) array: round and convert in C
+        if values.dtype.kind == "f" and precision is not None:
+            # float32 values would print with float64 noise: 0.11999999
+            values = values.astype("float64").round(precision)
+        elif values.dtype.kind == "f" and values.dtype.itemsize < 8:
+            # Same noise without rounding: go through the shortest repr
+            # of each value in its own precision (0.12, not 0.11999999)
+            values = values.astype(str).astype("float64")
+        return values.tolist()
+    if isinstance(values, array.array):
+        values = values.tolist()
+    else:
+        values = [_scalar(x) for x in values]
+    if precision is not None:
+        values = [round(x, precision) if isinstance(x, float) else x
+                  for x in values]
+    return values
+
+
+def _element(value: Any) -> str:
+
+    """
+    Ruby literal for a single value. Only used for non numeric sequences.
+    """
+
+    value = _scalar(value)
+    if value is None:
+        return "nil"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return _numbers([value])
+    if isinstance(value, str):
+        if _SYMBOL.match(value):
+            return ":" + value
+        return json.dumps(value).replace("#", "\\#")
+    if isinstance(value, (list, tuple)):
+        return "[" + ",".join(map(_element, value)) + "]"
+    raise TypeError(f"Can't send {type(value).__name__} to Sonic Pi")
+
+
+def _numbers(values: list) -> str:
+
+    """
+    Join a list of ints and floats. NaN and infinities are patched on the
+    joined string rather than checked value by value.
+    """
+
+    joined = ",".join(map(repr, values))
+    if "n" in joined:
+        joined = (joined.replace("nan", "Float::NAN")
+                        .replace("inf", "Float::INFINITY"))
+    return joined
+
+
+def array_literal(values: Any, precision: int = None) -> str:
+
+    """
+    Compact Ruby array literal: [60,62,64]. Floats are rounded to
+    `precision` decimals when given. Strings valid as Ruby identifiers
+    are turned into symbols (note names such as 'e4'), others are quoted.
+    """
+
+    values = _as_list(values, precision)
+    if all(type(x) in (int, float) for x in values):
+        return "[" + _numbers(values) + "]"
+    return "[" + ",".join(map(_element, values)) + "]"
+
+
+def ring_literal(values: Any, precision: int = None) -> str:
+
+    """
+    Compact Sonic Pi ring literal: [60,62,64].ring
+    """
+
+    return array_literal(values, precision) + ".ring"
+
+
+def set_ring_code(name: str, values: Any, precision: int = None) -> str:
+
+    """
+    Code storing a ring in Sonic Pi's Time State, to be read from running
+    live_loops with get[:name]. Updating a named ring doesn't require to
+    send the loop again.
+    """
+
+    if not _SYMBOL.match(name):
+        raise ValueError(f"Invalid ring name: {name}")
+    return f"set :{name}, {ring_literal(values, precision)}"
+
+
+def payload_size(code: str) -> int:
+
+    """
+    Size of the /run-code OSC message that would carry this code.
+    """
+
+    return (_osc_string_size(len("/run-code"))
+            + _osc_string_size(len(",is"))
+            + 4
+            + _osc_string_size(len(code.encode("utf-8"))))
+
+
+def check_payload(code: str, limit: int = MAX_PAYLOAD) -> int:
+
+    """
+    Raise a ValueError if the code doesn't fit in a single UDP packet.
+    Return the size of the message otherwise.
+    """
+
+    size = payload_size(code)
+    if size > limit:
+        raise ValueError(
+            f"Code too large for a single packet ({size} > {limit} bytes). "
+            "Lower the precision or send the values in several rings.")
+    return size
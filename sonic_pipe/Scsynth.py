@@ -0,0 +1,104 @@
+#!/usr/local/bin/python3
+# -*- coding: utf-8 -*-
+import itertools
+import threading
+
+from typing import Any
+
+from pythonosc import (osc_message_builder, osc_bundle_builder)
+
+from .Transport import hub
+
+# Sonic Pi allocates its own node ids from the bottom of the range. Ours
+# start high enough to never collide with them and wrap before 2^31.
+FIRST_NODE_ID = 2 ** 30
+LAST_NODE_ID = 2 ** 31 - 1
+
+# Shared by every client of the process, talking to the same scsynth
+_node_ids = itertools.cycle(range(FIRST_NODE_ID, LAST_NODE_ID))
+_node_ids_lock = threading.Lock()
+
+
+class ScsynthClient():
+
+    """
+    Talk directly to the scsynth instance booted by Sonic Pi, bypassing
+    the Ruby server and its evaluator. Only synthdefs already loaded by
+    Sonic Pi can be used (beep, saw, prophet...). Nothing goes through the
+    Sonic Pi mixer or FX chain unless target and out_bus are given.
+
+    Messages are sent right away unless a timestamp is given with `at`
+    (seconds since epoch, like time.time()), in which case they are
+    wrapped in a timestamped bundle scheduled by scsynth itself.
+    """
+
+    def __init__(self, address: str, port: int):
+        self._address, self._port = (address, port)
+        self._client = hub.acquire_client(address, port)
+
+    def close(self) -> None:
+        hub.release_client(self._address, self._port)
+
+    def _next_node_id(self) -> int:
+        with _node_ids_lock:
+            return next(_node_ids)
+
+    @staticmethod
+    def synthdef_name(synth: str) -> str:
+
+        """
+        Sonic Pi synthdefs are prefixed: 'beep' is 'sonic-pi-beep'.
+        """
+
+        return synth if synth.startswith("sonic-pi-") else "sonic-pi-" + synth
+
+    def _send(self, message, at: float = None) -> None:
+        if at is None:
+            self._client.send(message.build())
+        else:
+            bundle = osc_bundle_builder.OscBundleBuilder(at)
+            bundle.add_content(message.build())
+            self._client.send(bundle.build())
+
+    def new_synth(self, synth: str, at: float = None,
+                  target: int = 0, add_action: int = 0, **params: Any) -> int:
+
+        """
+        Start a synth with /s_new. Return the node id, usable with set_node
+        and free_node. Defaults to the head of the root group.
+        """
+
+        node_id = self._next_node_id()
+        message = osc_message_builder.OscMessageBuilder("/s_new")
+        message.add_arg(self.synthdef_name(synth))
+        message.add_arg(node_id)
+        message.add_arg(add_action)
+        message.add_arg(target)
+        for name, value in params.items():
+            message.add_arg(name)
+            message.add_arg(value)
+        self._send(message, at)
+        return node_id
+
+    def set_node(self, node_id: int, at: float = None, **params: Any) -> None:
+
+        """
+        Change controls of a running node with /n_set.
+        """
+
+        message = osc_message_builder.OscMessageBuilder("/n_set")
+        message.add_arg(node_id)
+        for name, value in params.items():
+            message.add_arg(name)
+            message.add_arg(value)
+        self._send(message, at)
+
+    def free_node(self, node_id: int, at: float = None) -> None:
+
+        """
+        Free a running node with /n_free.
+        """
+
+        message = osc_message_builder.OscMessageBuilder("/n_free")
+        message.add_arg(node_id)
+        self._send(message, at)
@@ -2,6 +2,8 @@
 # -*- coding: utf-8 -*-
 
 import os
+import sys
+import asyncio
 import contextlib
 import traceback
 import subprocess
@@ -10,9 +12,10 @@ import threading
 from setuptools import Command
 
 from art import tprint
-from pythonosc import (udp_client, osc_message_builder, dispatcher, osc_server)
+from pythonosc import (osc_message_builder, dispatcher)
 from inputimeout import (inputimeout, TimeoutOccurred)
-from typing import Any, List
+from typing import Any, List, Tuple
+from concurrent.futures import Future
 
 from time import sleep, strftime
 from platform import system
@@ -21,8 +24,14 @@ from queue import Queue
 
 from .Utilities import color
 from .History import HistoryItem
-from .DaemonConfig import DaemonConfig
+from .DaemonConfig import DaemonConfig, parse_port_line
 from .CommandParsing import CommandParser
+from .Evaluation import EvaluationResult
+from .Preflight import PreflightIssue
+from .Rings import set_ring_code, check_payload
+from .Scsynth import ScsynthClient
+from .Capture import CaptureWriter
+from .Transport import hub
 
 
 class SonicPipe():
@@ -48,6 +57,21 @@ class SonicPipe():
           few reserved keywords, as an additional command made
           available by Sonic Pipe.
         - false: currently unavailable!
+    - **fast_path**:
+        - true: also open a direct connection to scsynth, allowing
+          to trigger Sonic Pi synths from Python without going
+          through the Ruby server (see trigger and set_node).
+        - false: everything goes through the Ruby server.
+    - **capture_path**: if given, every log, error and cue message
+      received from the server is recorded to this file. See
+      Capture.load_capture to read it back.
+    - **preflight_mode**: local checks (do/end, brackets, strings)
+      performed before sending code: "off", "warn" (report but
+      send anyway) or "block" (never send code with issues).
+
+    Sockets are shared by every SonicPipe instance of the process (see
+    Transport.hub): several instances can listen to the same server.
+    Call close() to release them once an instance is no longer needed.
 
     Sonic Pipe will attempt to log the history of every session.
     Sessions can be found at $HOME/.sonic-pi/sonic-pipe-sessions.
@@ -61,7 +85,10 @@ class SonicPipe():
     def __init__(self, address='127.0.0.1',
                 use_daemon=False,
                 daemon_rb_location: str=None,
-                repl_mode=False):
+                repl_mode=False,
+                fast_path=False,
+                capture_path: str=None,
+                preflight_mode: str="warn"):
 
         ########################################
         # LOCATE DAEMON.RB FILE
@@ -85,6 +112,11 @@ class SonicPipe():
         self._home_dir = os.path.expanduser('~')
         self._logs = Queue()
         self._repl_mode = repl_mode
+        self._fast_path = fast_path
+        self._scsynth = None
+        self._capture_path = capture_path
+        self._capture = None
+        self._preflight_mode = preflight_mode
 
         # History Management
         self._history = []
@@ -116,12 +148,16 @@ class SonicPipe():
         try:
 
             if self._use_daemon:
-                self._daemon_client = udp_client.SimpleUDPClient(
+                self._daemon_client = hub.acquire_client(
                         self._address, int(self._values.daemon_keep_alive))
 
-            self._pipe_client = udp_client.SimpleUDPClient(
+            self._pipe_client = hub.acquire_client(
                     self._address, int(self._values.gui_send_to_server))
 
+            if self._fast_path:
+                self._scsynth = ScsynthClient(
+                        self._address, int(self._values.scsynth))
+
             self.setup_log_server()
 
             if self._repl_mode:
@@ -155,16 +191,14 @@ class SonicPipe():
     def setup_log_server(self) -> None:
 
         """
-        Opening up a server to display Sonic Pi GUI
-        logs from the terminal.
+        Listening to the server to display Sonic Pi GUI logs
+        from the terminal. The port is shared with every other
+        instance of the process through the transport hub.
         """
 
         # A dispatcher for OSC messages
         self._dispatcher, self._dispatcher_lock = (
             dispatcher.Dispatcher(), threading.Lock())
-        self._log_server = osc_server.BlockingOSCUDPServer(
-                ('127.0.0.1', int(self._values.gui_listen_to_server)),
-                self._dispatcher)
 
         # Setting up custom dispatchers for every type of information
         self._dispatcher.map(
@@ -176,11 +210,19 @@ class SonicPipe():
         self._dispatcher.map(
                 "/syntax_error", self.syntax_error_dispatcher)
 
-        # Starting the blocking server in another thread: dirty but it works!
-        self._log_server_thread = threading.Thread(
-            target=self._log_server.serve_forever)
-        self._log_server_thread.daemon = True
-        self._log_server_thread.start()
+        # Recording server traffic, away from printing and coloring
+        if self._capture_path is not None:
+            self._capture = CaptureWriter(self._capture_path)
+            self._capture.map(self._dispatcher)
+
+        hub.acquire_receiver(
+                int(self._values.gui_listen_to_server), self._dispatcher)
+
+        # Correlating replies with code sent through evaluate(): a
+        # single evaluator per port, shared with other instances.
+        self._evaluator = hub.evaluator(
+                int(self._values.gui_listen_to_server), self._address,
+                int(self._values.gui_send_to_server), self._values.token)
 
     def log_info_dispatcher(self, address: str,
                             fixed_argument: List[Any],
@@ -237,7 +279,7 @@ class SonicPipe():
         osc_mb = osc_message_builder
 
         def awake():
-            while self._keep_alive:
+            while not self._stop_keep_alive.is_set():
                 if self._daemon.poll() is not None:
                     print("Daemon died! Daemon should stay alive")
                     quit()
@@ -246,11 +288,39 @@ class SonicPipe():
                 self._daemon_client.send(keep_alive.build())
                 sleep(0.2)
 
-        self._keep_alive = threading.Event()
+        self._stop_keep_alive = threading.Event()
         self._alive_thread = threading.Thread(target=awake)
         self._alive_thread.start()
         print("Started keep alive dedicated thread.")
 
+    def close(self) -> None:
+
+        """
+        Release sockets and threads used by this instance. Shared
+        sockets are only closed once every instance released them.
+        """
+
+        if getattr(self, "_stop_keep_alive", None) is not None:
+            self._stop_keep_alive.set()
+        if getattr(self, "_dispatcher", None) is not None:
+            hub.release_receiver(
+                    int(self._values.gui_listen_to_server), self._dispatcher)
+            self._dispatcher = None
+        if self._capture is not None:
+            self._capture.close()
+            self._capture = None
+        if self._scsynth is not None:
+            self._scsynth.close()
+            self._scsynth = None
+        if getattr(self, "_pipe_client", None) is not None:
+            hub.release_client(
+                    self._address, int(self._values.gui_send_to_server))
+            self._pipe_client = None
+        if getattr(self, "_daemon_client", None) is not None:
+            hub.release_client(
+                    self._address, int(self._values.daemon_keep_alive))
+            self._daemon_client = None
+
     def find_daemon_path(self, user_provided: str = None) -> str:
 
         """
@@ -358,6 +428,45 @@ class SonicPipe():
             message.add_arg(f"set_volume! {volume}")
             self._pipe_client.send(message.build())
 
+    def set_ring(self, name: str, values: Any, precision: int = None) -> None:
+
+        """
+        Store a sequence (NumPy array, array.array, list...) as a named
+        ring in Sonic Pi's Time State. Running loops can read it with
+        get[:name] without being sent again.
+        """
+
+        code = set_ring_code(name, values, precision)
+        check_payload(code)
+        message = osc_message_builder.OscMessageBuilder("/run-code")
+        message.add_arg(self._values.token)
+        message.add_arg(code)
+        self._pipe_client.send(message.build())
+
+    def _require_fast_path(self) -> ScsynthClient:
+        if self._scsynth is None:
+            raise RuntimeError(
+                "Fast path disabled. Use SonicPipe(..., fast_path=True).")
+        return self._scsynth
+
+    def trigger(self, synth: str, at: float = None, **params: Any) -> int:
+
+        """
+        Start a Sonic Pi synth directly on scsynth, skipping the Ruby
+        server. Return the node id. Ex: trigger("beep", note=60, amp=0.5).
+        Use `at` (seconds since epoch) to schedule it with a timestamp.
+        """
+
+        return self._require_fast_path().new_synth(synth, at=at, **params)
+
+    def set_node(self, node_id: int, at: float = None, **params: Any) -> None:
+
+        """
+        Change controls of a node started with trigger.
+        """
+
+        self._require_fast_path().set_node(node_id, at=at, **params)
+
     def _send_keep_alive_message(self) -> None:
 
         """
@@ -382,7 +491,8 @@ class SonicPipe():
             daemon=self._daemon,
             client_pipe=self._pipe_client,
             use_daemon=self._use_daemon,
-            token=self._values.token)
+            token=self._values.token,
+            preflight_mode=self._preflight_mode)
 
         try:
             while True:
@@ -412,11 +522,17 @@ class SonicPipe():
                 self._daemon.terminate()
             self._exit_banner()
             quit()
+        finally:
+            # 'exit' and every quit() above end up here: flush the capture
+            self.close()
 
-    def pipe(self, code: str) -> None:
+    def pipe(self, code: str) -> Tuple[PreflightIssue, ...]:
 
         """
-        Send Code to a running instance of Sonic Pi without using the REPL
+        Send Code to a running instance of Sonic Pi without using the REPL.
+        Return the preflight issues found in the code, also printed to
+        stderr outside of the REPL. In "block" mode, code with issues is
+        not sent.
         """
 
         command_parser = CommandParser(
@@ -425,46 +541,47 @@ class SonicPipe():
             daemon=self._daemon,
             client_pipe=self._pipe_client,
             use_daemon=self._use_daemon,
-            token=self._values.token)
-        command_parser.parse(code)
+            token=self._values.token,
+            preflight_mode=self._preflight_mode)
+        try:
+            issues = command_parser.parse(code)
+        except SystemExit:
+            # 'exit' was piped: release everything before leaving
+            self.close()
+            raise
+        if not self._repl_mode:
+            # Nobody drains the logs outside of the REPL
+            for issue in issues:
+                print(issue, file=sys.stderr)
+        return issues
 
-    def extract_values_from_port_line(self, portline) -> dict:
+    def evaluate(self, code: str, timeout: float = 5.0) -> Future:
 
         """
-        Grab the message received from spider.log and interpret data.
+        Send Code to a running instance of Sonic Pi and return a future
+        resolved with an EvaluationResult once the server is done with it:
+        success, error (with line and message), timeout, or closed if the
+        instance was closed before any reply.
         """
 
-        command_parser = CommandParser(
-            history=self._history,
-            logs=self._logs,
-            daemon=self._daemon,
-            client_pipe=self._pipe_client,
-            use_daemon=self._use_daemon,
-            token=self._values.token)
+        return self._evaluator.evaluate(code, timeout=timeout)
+
+    async def evaluate_async(self, code: str,
+                             timeout: float = 5.0) -> EvaluationResult:
 
-        values = {}
+        """
+        Awaitable version of evaluate() for asyncio programs.
+        """
 
-        def pairwise(iterable):
-            """ Iterate pairwise on iterator """
-            a = iter(iterable)
-            return zip(a, a)
+        return await asyncio.wrap_future(self.evaluate(code, timeout=timeout))
 
-        # list of string replacements to perform
-        to_replace = [
-            "Ports: {", "", "}",
-            "", "\n", "", ":", " ",
-            ",", " ", "=>", " "]
+    def extract_values_from_port_line(self, portline) -> dict:
 
-        for token, replacer in pairwise(to_replace):
-            portline = portline.replace(token, replacer)
-        portline = portline.split(" ")
-        portline = [x for x in filter(
-                lambda x: x != "",
-                portline)]
-        for field, value in pairwise(portline):
-            values[field] = int(value)
+        """
+        Grab the message received from spider.log and interpret data.
+        """
 
-        return values
+        return parse_port_line(portline)
 
     def find_address_and_token(self) -> None:
 
@@ -475,25 +592,4 @@ class SonicPipe():
         """
 
         suffix = "/.sonic-pi/log/spider.log"
-
-        port_line = None
-        token_line = None
-        with open(self._home_dir + suffix, "r") as f:
-            for i in f.readlines():
-                if i.startswith("Ports:"):
-                    port_line = i
-                if i.startswith("Token: "):
-                    token_line = i
-
-        self._values = self.extract_values_from_port_line(port_line)
-        print(self._values)
-
-        self._values = DaemonConfig(
-            daemon_keep_alive=self._values['server_port'],
-            gui_listen_to_server=self._values['gui_port'],
-            gui_send_to_server=self._values['scsynth_port'],
-            scsynth=self._values['scsynth_send_port'],
-            osc_cues=self._values['osc_cues_port'],
-            tau_api=self._values['tau_port'],
-            tau_phx=self._values['listen_to_tau_port'],
-            token=abs(int(token_line.replace("Token: ", ""))))
+        self._values = DaemonConfig.from_spider_log(self._home_dir + suffix)
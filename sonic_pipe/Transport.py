@@ -0,0 +1,143 @@
+#!/usr/local/bin/python3
+# -*- coding: utf-8 -*-
+import threading
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Tuple
+
+from pythonosc import (udp_client, dispatcher, osc_server)
+
+from .Evaluation import Evaluator
+
+
+class _FanOutDispatcher():
+
+    """
+    Stands for a pythonosc dispatcher on a shared receiver: every packet
+    is handed to each dispatcher registered on it. Never replies.
+    """
+
+    def __init__(self):
+        self.dispatchers: List[Any] = []
+
+    def call_handlers_for_packet(self, data: bytes,
+                                 client_address: Tuple[str, int]) -> List[Any]:
+        for osc_dispatcher in list(self.dispatchers):
+            osc_dispatcher.call_handlers_for_packet(data, client_address)
+        return []
+
+
+@dataclass
+class _Receiver:
+    server: Any
+    thread: threading.Thread
+    fan_out: _FanOutDispatcher
+    own_dispatcher: Any
+    evaluator: Evaluator = None
+    evaluator_target: Tuple[str, int] = None
+    owners: List[Any] = field(default_factory=list)
+
+
+class TransportHub():
+
+    """
+    Process-wide owner of the OSC sockets used by SonicPipe instances.
+    Several instances talking to the same Sonic Pi server share a single
+    client socket per target and a single receiver per listen port, which
+    routes every log and cue message to all of the registered instances.
+
+    Everything is reference counted: the last release of a client closes
+    its socket, the last release of a receiver stops its thread and frees
+    the port. Use the module-level `hub` rather than creating your own.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._clients: Dict[Tuple[str, int], List[Any]] = {}
+        self._receivers: Dict[int, _Receiver] = {}
+
+    def acquire_client(self, address: str, port: int) -> udp_client.SimpleUDPClient:
+
+        """
+        Get the shared client for this target, creating it if needed.
+        """
+
+        with self._lock:
+            entry = self._clients.get((address, port))
+            if entry is None:
+                entry = self._clients[(address, port)] = [
+                    udp_client.SimpleUDPClient(address, port), 0]
+            entry[1] += 1
+            return entry[0]
+
+    def release_client(self, address: str, port: int) -> None:
+        with self._lock:
+            entry = self._clients.get((address, port))
+            if entry is None:
+                return
+            entry[1] -= 1
+            if entry[1] <= 0:
+                del self._clients[(address, port)]
+                sock = getattr(entry[0], "_sock", None)
+                if sock is not None:
+                    sock.close()
+
+    def acquire_receiver(self, port: int, osc_dispatcher) -> None:
+
+        """
+        Route messages received on this port to a dispatcher. The port is
+        bound on first use. Raise OSError if it can't be bound.
+        """
+
+        with self._lock:
+            receiver = self._receivers.get(port)
+            if receiver is None:
+                fan_out = _FanOutDispatcher()
+                own_dispatcher = dispatcher.Dispatcher()
+                fan_out.dispatchers.append(own_dispatcher)
+                server = osc_server.BlockingOSCUDPServer(
+                        ('127.0.0.1', port), fan_out)
+                thread = threading.Thread(target=server.serve_forever)
+                thread.daemon = True
+                thread.start()
+                receiver = self._receivers[port] = _Receiver(
+                    server, thread, fan_out, own_dispatcher)
+            receiver.owners.append(osc_dispatcher)
+            receiver.fan_out.dispatchers.append(osc_dispatcher)
+
+    def release_receiver(self, port: int, osc_dispatcher) -> None:
+        with self._lock:
+            receiver = self._receivers.get(port)
+            if receiver is None or osc_dispatcher not in receiver.owners:
+                return
+            receiver.owners.remove(osc_dispatcher)
+            receiver.fan_out.dispatchers.remove(osc_dispatcher)
+            if not receiver.owners:
+                del self._receivers[port]
+                receiver.server.shutdown()
+                receiver.server.server_close()
+                if receiver.evaluator is not None:
+                    receiver.evaluator.close()
+                    self.release_client(*receiver.evaluator_target)
+
+    def evaluator(self, port: int, address: str,
+                  send_port: int, token: int) -> Evaluator:
+
+        """
+        Shared evaluator for a receiver. Acks and errors reach every
+        instance listening on the port, so a single evaluator per port
+        correlates them for everybody. The receiver must be acquired.
+        """
+
+        with self._lock:
+            receiver = self._receivers[port]
+            if receiver.evaluator is None:
+                receiver.evaluator = Evaluator(
+                    self.acquire_client(address, send_port), token, port)
+                receiver.evaluator_target = (address, send_port)
+                receiver.evaluator.map(receiver.own_dispatcher)
+            return receiver.evaluator
+
+
+# Shared by every SonicPipe instance of the process
+hub = TransportHub()
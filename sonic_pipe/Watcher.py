@@ -0,0 +1,141 @@
+#!/usr/local/bin/python3
+# -*- coding: utf-8 -*-
+import os
+import hashlib
+
+from typing import Callable, List, Set, Tuple
+from time import sleep, monotonic
+
+from .CodeSplitting import split_blocks, context_setting
+
+
+class FileWatcher():
+
+    """
+    Watch a .rb file and resend only the top-level blocks that changed
+    since the last time it was sent. The file is first sent as a whole.
+    Then, every time it is saved, it is split into top-level blocks
+    (live_loop, define, with_fx, single statements...) and each block is
+    compared against a cache of content hashes. Unchanged blocks are not
+    sent at all.
+
+    Top-level settings such as use_bpm are prepended to every following
+    block that is resent, because each evaluation starts a new job with
+    default settings. Changing one of them resends every block after it.
+
+    Changes are detected by polling the file status, which doesn't need
+    any platform specific notification API. A change is only picked up
+    once the file stayed untouched for `debounce` seconds, so that
+    editors writing a file in several steps only trigger one resend.
+    """
+
+    def __init__(self, path: str, send: Callable[[str], None],
+                 interval: float = 0.1, debounce: float = 0.2):
+        self._path = path
+        self._send = send
+        self._interval, self._debounce = (interval, debounce)
+        self._sent_hashes: Set[str] = set()
+        self._signature = None
+        self._pending = None
+        self._changed_at = 0.0
+
+    def _stat_signature(self) -> Tuple[int, int, int]:
+        stat = os.stat(self._path)
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def _units(self, text: str) -> List[Tuple[str, str]]:
+
+        """
+        Turn the buffer into (block, unit) pairs, the unit being what
+        would be sent to the server for this block: the block preceded by
+        the settings in force at its position in the file.
+        """
+
+        context = {}
+        units = []
+        for block in split_blocks(text):
+            name = context_setting(block)
+            if name is not None:
+                context[name] = block
+                continue
+            prefix = "\n".join(context.values())
+            units.append((block, prefix + "\n" + block if prefix else block))
+        return units
+
+    @staticmethod
+    def _hash(unit: str) -> str:
+        return hashlib.sha1(unit.encode("utf-8")).hexdigest()
+
+    def _reload(self) -> List[str]:
+
+        """
+        Read the file, send what changed and update the hash cache.
+        Return the list of blocks that were sent.
+        """
+
+        with open(self._path, "r") as f:
+            text = f.read()
+        units = self._units(text)
+        hashes = [self._hash(unit) for _, unit in units]
+
+        if self._signature is None:
+            # First load: send the buffer as Sonic Pi would
+            self._send(text)
+            changed = [block for block, _ in units]
+        else:
+            changed = []
+            for (block, unit), digest in zip(units, hashes):
+                if digest not in self._sent_hashes:
+                    self._send(unit)
+                    changed.append(block)
+
+        self._sent_hashes = set(hashes)
+        return changed
+
+    def poll(self) -> List[str]:
+
+        """
+        Check the file once. Return the list of blocks sent, if any.
+        """
+
+        try:
+            signature = self._stat_signature()
+        except OSError:
+            # File is being replaced by the editor, try again later
+            return []
+
+        if self._signature is None:
+            try:
+                changed = self._reload()
+            except OSError:
+                return []
+            self._signature = signature
+            return changed
+
+        now = monotonic()
+        if signature != self._signature:
+            if signature != self._pending:
+                self._pending, self._changed_at = (signature, now)
+                return []
+            if now - self._changed_at < self._debounce:
+                return []
+            self._signature, self._pending = (signature, None)
+            try:
+                return self._reload()
+            except OSError:
+                return []
+        return []
+
+    def watch(self) -> None:
+
+        """
+        Poll the file until interrupted by the user (^C).
+        """
+
+        try:
+            while True:
+                for block in self.poll():
+                    print(f"Sent: {block.splitlines()[0]}")
+                sleep(self._interval)
+        except KeyboardInterrupt:
+            pass
@@ -1,11 +1,107 @@
 #!/usr/local/bin/python3
 # -*- coding: utf-8 -*-
+import os
+import sys
 import argparse
+from typing import List
 from .Utilities import str2bool
-from .SonicPipe import SonicPipe
+from .Batch import BatchRunner
+from .Watcher import FileWatcher
+from .DaemonConfig import DaemonConfig
+from .Preflight import PREFLIGHT_MODES
+
+
+def __getattr__(name: str):
+    # SonicPipe pulls rich and art: only load it when it is needed, so
+    # that 'sonic-pipe run' and 'sonic-pipe watch' start fast.
+    if name == "SonicPipe":
+        return _load_sonic_pipe()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _load_sonic_pipe():
+    # Importing the submodule binds its name on the package: put the
+    # class back in its place, as 'from sonic_pipe import SonicPipe' expects.
+    from .SonicPipe import SonicPipe
+    globals()["SonicPipe"] = SonicPipe
+    return SonicPipe
+
+
+def _spider_config() -> DaemonConfig:
+    spider_log = os.path.expanduser('~') + "/.sonic-pi/log/spider.log"
+    try:
+        return DaemonConfig.from_spider_log(spider_log)
+    except (OSError, ValueError) as e:
+        print(f"Couldn't find a running Sonic Pi instance: {e}", file=sys.stderr)
+        return None
+
+
+def run(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(
+            prog='sonic-pipe run',
+            description='Send files or stdin to a running Sonic Pi Instance.')
+    parser.add_argument("files", nargs='*',
+                        help="Files to send, one unit per file. Stdin if empty or '-'.")
+    parser.add_argument("--whole", '-w', action='store_true',
+                        help="Send stdin as a single unit instead of splitting it.")
+    parser.add_argument("--wait", type=float, default=1.0,
+                        help="Seconds to wait for late error replies.")
+    parser.add_argument("--no-listen", action='store_true',
+                        help="Don't listen to server errors (exit status won't reflect them).")
+    parser.add_argument("--address", '-a', default='127.0.0.1',
+                        help="Address of the Sonic Pi server.")
+    parser.add_argument("--preflight", choices=PREFLIGHT_MODES, default="warn",
+                        help="Local checks performed before sending code.")
+    arg = parser.parse_args(argv)
+
+    values = _spider_config()
+    if values is None:
+        return 2
+
+    runner = BatchRunner(values, address=arg.address,
+                         listen=not arg.no_listen,
+                         preflight_mode=arg.preflight)
+    for path in arg.files or ['-']:
+        if path == '-':
+            runner.run_stream(sys.stdin, whole=arg.whole)
+        else:
+            runner.run_file(path)
+    return runner.finish(wait=arg.wait)
+
+
+def watch(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(
+            prog='sonic-pipe watch',
+            description='Resend the blocks of a file that changed on save.')
+    parser.add_argument("file", help="File to watch.")
+    parser.add_argument("--debounce", type=float, default=0.2,
+                        help="Seconds the file must stay untouched before resending.")
+    parser.add_argument("--address", '-a', default='127.0.0.1',
+                        help="Address of the Sonic Pi server.")
+    parser.add_argument("--preflight", choices=PREFLIGHT_MODES, default="warn",
+                        help="Local checks performed before sending code.")
+    arg = parser.parse_args(argv)
+
+    values = _spider_config()
+    if values is None:
+        return 2
+
+    runner = BatchRunner(values, address=arg.address,
+                         preflight_mode=arg.preflight)
+    FileWatcher(arg.file, runner.send, debounce=arg.debounce).watch()
+    return runner.finish(wait=0)
 
 
 def repl() -> None:
+    if sys.argv[1:2] == ["run"]:
+        sys.exit(run(sys.argv[2:]))
+    if sys.argv[1:2] == ["watch"]:
+        sys.exit(watch(sys.argv[2:]))
+    if len(sys.argv) == 1 and not sys.stdin.isatty():
+        # 'sonic-pipe < set.rb' or 'cat *.rb | sonic-pipe'
+        sys.exit(run([]))
+
+    SonicPipe = _load_sonic_pipe()
     parser = argparse.ArgumentParser(
             description='Command line pipe to a running Sonic Pi Instance.')
     parser.add_argument("--daemon_path", '-d', nargs='?',
@@ -14,10 +110,17 @@ def repl() -> None:
                         default=False, help="Run as daemon.", required=True)
     parser.add_argument("--repl", '-r', type=str2bool, nargs='?', const=True,
                         default=False, help="Start as REPL.", required=True)
+    parser.add_argument("--capture", '-c', nargs='?', const=None,
+                        help="Record server logs, errors and cues to this file.")
+    parser.add_argument("--preflight", choices=PREFLIGHT_MODES, default="warn",
+                        help="Local checks performed before sending code.")
     arg = parser.parse_args()
     if arg.daemon_path is None:
         SonicPipe(use_daemon=arg.daemon, repl_mode=arg.repl,
-                  daemon_rb_location=None)
+                  daemon_rb_location=None, capture_path=arg.capture,
+                  preflight_mode=arg.preflight)
     else:
         SonicPipe(use_daemon=arg.daemon, repl_mode=arg.repl,
-                  daemon_rb_location=arg.daemon_path)
+                  daemon_rb_location=arg.daemon_path,
+                  capture_path=arg.capture,
+                  preflight_mode=arg.preflight)